@@ -1,7 +1,12 @@
-import requests, statistics, sys, time
+import sys, time
+import csv
+import math
 import os
-import pandas as pd
-from typing import List, Optional
+import httpx
+import numpy as np
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 from datetime import datetime
 import pytz
 
@@ -12,6 +17,7 @@ ENDPOINTS = [
 
 HEADERS = {
     "Accept": "application/json, text/plain, */*",
+    "Accept-Encoding": "gzip, deflate, br",
     "Content-Type": "application/json",
     "Origin": "https://p2p.binance.com",
     "Referer": "https://p2p.binance.com/",
@@ -24,40 +30,106 @@ FIAT = "BOB"
 ASSET = "USDT"
 ROWS = 20    
 MAX_PAGES = 50     
-PAGE_SLEEP = 0.25 
+PAGE_BATCH = 4
+FETCH_WORKERS = 8
 TRANS_AMOUNT = None
 COUNTRIES = ["BO"]
 PAY_TYPES: List[str] = []  
 
-def build_payload(trade_type: str) -> dict:
-    p = {
-        "fiat": FIAT,
-        "asset": ASSET,
-        "tradeType": trade_type,
-        "page": 1,
-        "rows": ROWS,
-        "payTypes": PAY_TYPES,
-        "proMerchantAds": False,
-        "shieldMerchantAds": False,
-        "filterType": "all",
-        "publisherType": None,
-        "additionalKycVerifyFilter": 0,
-    }
-    if TRANS_AMOUNT:
-        p["transAmount"] = TRANS_AMOUNT
+CSV_PATH = "data/bob_p2p_history.csv"
+VOL_STATE_PATH = "data/bob_p2p_vol_state.json"
+COLS = [
+    "ts",
+    "buy_count", "buy_min", "buy_median", "buy_max",
+    "sell_count", "sell_min", "sell_median", "sell_max",
+    "mid_BOB_per_USDT",
+    "best_ask", "best_bid",
+    "spread_abs", "spread_pct",
+    "median_gap", "depth_imbalance",
+    "effective_spread_pct",
+    "mid_change_abs", "mid_change_pct",
+    "rolling_24h_vol", "rolling_7d_vol",
+]
+VOL_WINDOWS = {
+    "rolling_24h_vol": (24, 8),
+    "rolling_7d_vol": (24 * 7, 24),
+}
+TAIL_ROWS = max(w for w, _ in VOL_WINDOWS.values())
+CSV_BUFFER = 1 << 16
+
+RETRIES = 3
+RETRY_BACKOFF = 0.3
+RETRY_STATUS = {429, 500, 502, 503, 504}
+TIMEOUT = httpx.Timeout(connect=3.0, read=10.0, write=5.0, pool=5.0)
+
+_CLIENT = httpx.Client(
+    headers=HEADERS,
+    timeout=TIMEOUT,
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=RETRIES,
+        limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+    ),
+)
+
+_PAYLOAD_TPL = {
+    "fiat": FIAT,
+    "asset": ASSET,
+    "tradeType": None,
+    "page": 1,
+    "rows": ROWS,
+    "payTypes": PAY_TYPES,
+    "proMerchantAds": False,
+    "shieldMerchantAds": False,
+    "filterType": "all",
+    "publisherType": None,
+    "additionalKycVerifyFilter": 0,
+}
+if TRANS_AMOUNT:
+    _PAYLOAD_TPL["transAmount"] = TRANS_AMOUNT
+
+def build_payload(trade_type: str, page: int = 1) -> dict:
+    p = _PAYLOAD_TPL.copy()
+    p["tradeType"] = trade_type
+    p["page"] = page
     return p
 
-def try_post(url: str, payload: dict, timeout: int = 20) -> Optional[dict]:
-    r = requests.post(url, headers=HEADERS, json=payload, timeout=timeout)
+def try_post(url: str, payload: dict, timeout: httpx.Timeout = TIMEOUT) -> Optional[dict]:
+    """
+    POST over the shared HTTP/2 client; every concurrent page request is a
+    stream on the same connection. Retries RETRY_STATUS responses with
+    exponential backoff (connect errors are retried by the transport).
+    """
+    body = orjson.dumps(payload)
+    for attempt in range(RETRIES + 1):
+        r = _CLIENT.post(url, content=body, timeout=timeout)
+        if r.status_code not in RETRY_STATUS or attempt == RETRIES:
+            break
+        time.sleep(RETRY_BACKOFF * (2 ** attempt))
     if r.status_code != 200:
         print(f"[debug] {url} -> {r.status_code} {r.text[:160]}")
         return None
     try:
-        return r.json()
-    except Exception as e:
+        return orjson.loads(r.content)
+    except orjson.JSONDecodeError as e:
         print(f"[debug] {url} -> invalid JSON: {e}")
         return None
 
+def extract_prices(j: dict) -> np.ndarray:
+    """
+    Fast path for the usual {"data": [{"adv": {"price": "..."}}, ...]} response:
+    numpy parses the price strings straight into a preallocated float64 array.
+    Falls back to the recursive walk when the payload has a different shape
+    or some ad lacks a price.
+    """
+    data = j.get("data")
+    if isinstance(data, list) and data:
+        try:
+            return np.fromiter((it["adv"]["price"] for it in data), dtype=np.float64, count=len(data))
+        except (KeyError, TypeError, ValueError):
+            pass
+    return np.asarray(extract_prices_from_data_obj(data), dtype=np.float64)
+
 def extract_prices_from_data_obj(obj) -> List[float]:
     """Return a list of floats found at adv.price in a list/dict returned under 'data'."""
     prices: List[float] = []
@@ -78,53 +150,63 @@ def extract_prices_from_data_obj(obj) -> List[float]:
 def _safe_div(n, d):
     return (n / d) if (d not in (0, None)) else None
 
-def fetch_side(trade_type: str) -> List[float]:
+def fetch_page(trade_type: str, page: int) -> Tuple[np.ndarray, Optional[int]]:
     """
-    Fetch ALL visible offers for the given side by paging through results.
-    trade_type: "BUY" (you buy USDT with BOB) or "SELL" (you sell USDT for BOB).
-    Returns a flat list of adv.price floats across all pages.
+    Fetch one page of offers for the given side.
+    Returns (prices, total) where total is the ad count Binance reports for
+    the whole query (None if absent); prices is empty when nothing usable came back.
     """
-    page = 1
-    all_prices: List[float] = []
-    while page <= MAX_PAGES:
-        payload = build_payload(trade_type)
-        payload["page"] = page
-        payload["rows"] = ROWS
-
-        page_prices: List[float] = []
-        got_any = False
-
-        last_err = None
-        for url in ENDPOINTS:
-            j = try_post(url, payload)
-            if not j:
-                continue
+    payload = build_payload(trade_type, page)
 
-            data = j.get("data")
-            if data is None:
-                pass
+    for url in ENDPOINTS:
+        j = try_post(url, payload)
+        if not j:
+            continue
 
-            prices = extract_prices_from_data_obj(data)
-            if prices:
-                got_any = True
-                page_prices = prices
-                break
-            else:
-                top_keys = list(j.keys())[:6]
-                print(f"[debug] page {page} -> 200 but no adv.price found. keys={top_keys}")
+        total = j.get("total")
+        prices = extract_prices(j)
+        if prices.size:
+            return prices, (total if isinstance(total, int) else None)
 
-        if not got_any:
-            break
+        top_keys = list(j.keys())[:6]
+        print(f"[debug] page {page} -> 200 but no adv.price found. keys={top_keys}")
 
-        all_prices.extend(page_prices)
+    return np.empty(0), None
 
-        if len(page_prices) < ROWS:
-            break
+def fetch_side(trade_type: str, executor: ThreadPoolExecutor) -> np.ndarray:
+    """
+    Fetch ALL visible offers for the given side by paging through results.
+    trade_type: "BUY" (you buy USDT with BOB) or "SELL" (you sell USDT for BOB).
+    Page 1 also carries Binance's `total`, which fixes the page count, so the
+    remaining pages are submitted at once on executor, which must not be the
+    pool running fetch_side itself. Without a total, pages go out PAGE_BATCH
+    at a time until an under-full page is seen.
+    Returns one float64 array of adv.price values across all pages.
+    """
+    def page_prices(p: int) -> np.ndarray:
+        return fetch_page(trade_type, p)[0]
 
-        page += 1
-        time.sleep(PAGE_SLEEP)
+    first, total = fetch_page(trade_type, 1)
+    chunks = [first]
+    page = 2
 
-    if not all_prices:
+    if total is not None:
+        npages = min(MAX_PAGES, math.ceil(total / ROWS))
+        chunks.extend(executor.map(page_prices, range(page, npages + 1)))
+        page = max(npages + 1, page)
+    else:
+        done = first.size < ROWS
+        while not done and page <= MAX_PAGES:
+            batch = range(page, min(page + PAGE_BATCH, MAX_PAGES + 1))
+            for prices in executor.map(page_prices, batch):
+                chunks.append(prices)
+                if prices.size < ROWS:
+                    done = True
+                    break
+            page += len(batch)
+
+    all_prices = np.concatenate(chunks)
+    if not all_prices.size:
         raise RuntimeError(
             f"No prices found for tradeType={trade_type} across pages 1..{page-1}. "
             "Try adjusting headers, VPN, or payload filters (payTypes/countries)."
@@ -132,18 +214,138 @@ def fetch_side(trade_type: str) -> List[float]:
 
     return all_prices
 
-def median(xs: List[float]) -> Optional[float]:
-    return statistics.median(xs) if xs else None
+def min_median_max(xs: np.ndarray) -> Tuple[float, float, float]:
+    """Min, median and max from one float64 array (np.median partitions instead of sorting)."""
+    arr = np.asarray(xs, dtype=np.float64)
+    return float(arr.min()), float(np.median(arr)), float(arr.max())
+
+def _to_float(x) -> Optional[float]:
+    try:
+        v = float(x)
+    except (TypeError, ValueError):
+        return None
+    return None if np.isnan(v) else v
+
+def read_tail(path: str, n: int) -> Tuple[List[str], List[dict]]:
+    """
+    Return (header, last n data rows) of a CSV, reading backwards from the end
+    of the file in blocks so the cost does not grow with the history length.
+    """
+    block = 1 << 16
+    with open(path, "rb") as f:
+        header_line = f.readline()
+        start = f.tell()
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buf = b""
+        while pos > start and buf.count(b"\n") <= n:
+            step = min(block, pos - start)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+
+    # split before decoding: the first line may start mid-character at the seek offset
+    lines = buf.split(b"\n")
+    if pos > start:
+        lines = lines[1:]
+    lines = [ln.decode("utf-8").rstrip("\r") for ln in lines if ln.strip()][-n:]
+
+    header = next(csv.reader([header_line.decode("utf-8")]))
+    return header, list(csv.DictReader(lines, fieldnames=header))
+
+def rewrite_history(path: str) -> None:
+    """
+    One-off full rewrite when the on-disk header does not match COLS or the
+    file has CRLF rows; every row comes out with a "\n" terminator.
+    Written to a temp file and swapped in with os.replace so a crash or an
+    overlapping run never leaves a truncated history behind.
+    """
+    tmp = path + ".tmp"
+    with open(path, newline="") as src, open(tmp, "w", buffering=CSV_BUFFER, newline="") as dst:
+        w = csv.DictWriter(dst, fieldnames=COLS, extrasaction="ignore", lineterminator="\n")
+        w.writeheader()
+        w.writerows(csv.DictReader(src))
+    os.replace(tmp, path)
+
+def has_crlf_tail(path: str, block: int = 1 << 16) -> bool:
+    """True if the last block of path has CRLF rows (appended before the writers set lineterminator)."""
+    with open(path, "rb") as f:
+        f.seek(max(0, os.path.getsize(path) - block))
+        return b"\r\n" in f.read()
+
+def _window_push(w: dict, x: Optional[float], window: int) -> None:
+    """
+    Slide one sample into a rolling window state {"values", "n", "mean", "M2"}
+    using Welford's online update; None samples take a slot but are not counted.
+    """
+    values = w["values"]
+    values.append(x)
+    if len(values) > window:
+        y = values.pop(0)
+        if y is not None:
+            w["n"] -= 1
+            if w["n"] == 0:
+                w["mean"], w["M2"] = 0.0, 0.0
+            else:
+                delta = y - w["mean"]
+                w["mean"] -= delta / w["n"]
+                w["M2"] -= delta * (y - w["mean"])
+    if x is not None:
+        w["n"] += 1
+        delta = x - w["mean"]
+        w["mean"] += delta / w["n"]
+        w["M2"] += delta * (x - w["mean"])
+
+def _window_std(w: dict, min_periods: int) -> Optional[float]:
+    """Sample std of the window, same semantics as pandas rolling(window, min_periods).std()."""
+    if w["n"] < max(min_periods, 2):
+        return None
+    return math.sqrt(max(w["M2"], 0.0) / (w["n"] - 1))
+
+def vol_state_from_tail(tail: List[dict]) -> dict:
+    """Rebuild the rolling-vol state from the last TAIL_ROWS rows of the history."""
+    state = {
+        "last_ts": tail[-1]["ts"] if tail else None,
+        "prev_mid": None,
+        "windows": {col: {"values": [], "n": 0, "mean": 0.0, "M2": 0.0} for col in VOL_WINDOWS},
+    }
+    for r in tail:
+        x = _to_float(r.get("mid_BOB_per_USDT"))
+        for col, (window, _) in VOL_WINDOWS.items():
+            _window_push(state["windows"][col], x, window)
+        state["prev_mid"] = x
+    return state
+
+def load_vol_state(last_ts: Optional[str]) -> Optional[dict]:
+    """Sidecar state, or None when missing/unreadable or not in sync with the CSV's last row."""
+    try:
+        with open(VOL_STATE_PATH, "rb") as f:
+            state = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    if state.get("last_ts") != last_ts or set(state.get("windows", {})) != set(VOL_WINDOWS):
+        return None
+    return state
+
+def save_vol_state(state: dict) -> None:
+    tmp = VOL_STATE_PATH + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(orjson.dumps(state))
+    os.replace(tmp, VOL_STATE_PATH)
 
 def main():
     eastern = pytz.timezone("America/New_York")
     started = datetime.now(eastern).strftime("%Y-%m-%d %H:%M:%S %Z")
 
-    buy_prices  = fetch_side("BUY") 
-    sell_prices = fetch_side("SELL")
+    # the sides block on their page futures, so pages get a pool of their own
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pages, ThreadPoolExecutor(max_workers=2) as sides:
+        buy_future  = sides.submit(fetch_side, "BUY", pages)
+        sell_future = sides.submit(fetch_side, "SELL", pages)
+        buy_prices  = buy_future.result()
+        sell_prices = sell_future.result()
 
-    buy_min,  buy_med,  buy_max  = min(buy_prices),  median(buy_prices),  max(buy_prices)
-    sell_min, sell_med, sell_max = min(sell_prices), median(sell_prices), max(sell_prices)
+    buy_min,  buy_med,  buy_max  = min_median_max(buy_prices)
+    sell_min, sell_med, sell_max = min_median_max(sell_prices)
     mid = round((buy_med + sell_med) / 2, 6) if (buy_med and sell_med) else None
 
     best_ask = buy_min    
@@ -186,22 +388,8 @@ def main():
         }
     }
 
-    CSV_PATH = "data/bob_p2p_history.csv"
     os.makedirs(os.path.dirname(CSV_PATH), exist_ok=True)
 
-    COLS = [
-        "ts",
-        "buy_count", "buy_min", "buy_median", "buy_max",
-        "sell_count", "sell_min", "sell_median", "sell_max",
-        "mid_BOB_per_USDT",
-        "best_ask", "best_bid",
-        "spread_abs", "spread_pct",
-        "median_gap", "depth_imbalance",
-        "effective_spread_pct",
-        "mid_change_abs", "mid_change_pct",
-        "rolling_24h_vol", "rolling_7d_vol",
-    ]
-
     new_row = {
         "ts": started,
         "buy_count": len(buy_prices),
@@ -227,31 +415,38 @@ def main():
         "rolling_7d_vol": None,
     }
 
-    file_has_data = os.path.exists(CSV_PATH) and os.path.getsize(CSV_PATH) > 0
-    if file_has_data:
-        try:
-            df = pd.read_csv(CSV_PATH)
-        except Exception:
-            df = pd.DataFrame(columns=COLS)
+    state = None
+    if os.path.exists(CSV_PATH) and os.path.getsize(CSV_PATH) > 0:
+        header, tail = read_tail(CSV_PATH, 1)
+        if header != COLS or has_crlf_tail(CSV_PATH):
+            rewrite_history(CSV_PATH)
+            header, tail = read_tail(CSV_PATH, 1)
+        state = load_vol_state(tail[-1]["ts"] if tail else None)
+        if state is None:
+            _, tail = read_tail(CSV_PATH, TAIL_ROWS)
+            state = vol_state_from_tail(tail)
+        write_header = False
     else:
-        df = pd.DataFrame(columns=COLS)
-
-    for c in COLS:
-        if c not in df.columns:
-            df[c] = None
-
-    if len(df) > 0 and "mid_BOB_per_USDT" in df.columns:
-        prev_mid = df["mid_BOB_per_USDT"].iloc[-1]
-        if pd.notnull(prev_mid) and mid is not None:
-            new_row["mid_change_abs"] = mid - prev_mid
-            new_row["mid_change_pct"] = _safe_div((mid - prev_mid), prev_mid)
-
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-
-    df["rolling_24h_vol"] = pd.to_numeric(df["mid_BOB_per_USDT"], errors="coerce").rolling(window=24, min_periods=8).std()
-    df["rolling_7d_vol"]  = pd.to_numeric(df["mid_BOB_per_USDT"], errors="coerce").rolling(window=24*7, min_periods=24).std()
-
-    df[COLS].to_csv(CSV_PATH, index=False)
+        state = vol_state_from_tail([])
+        write_header = True
+
+    prev_mid = state["prev_mid"]
+    if prev_mid is not None and mid is not None:
+        new_row["mid_change_abs"] = mid - prev_mid
+        new_row["mid_change_pct"] = _safe_div((mid - prev_mid), prev_mid)
+
+    for col, (window, min_periods) in VOL_WINDOWS.items():
+        _window_push(state["windows"][col], mid, window)
+        new_row[col] = _window_std(state["windows"][col], min_periods)
+    state["prev_mid"] = mid
+    state["last_ts"] = started
+
+    with open(CSV_PATH, "a", buffering=CSV_BUFFER, newline="") as f:
+        w = csv.DictWriter(f, fieldnames=COLS, lineterminator="\n")
+        if write_header:
+            w.writeheader()
+        w.writerow(new_row)
+    save_vol_state(state)
 
     print(f"[logger] Appended new row to {CSV_PATH}")
     print(out)
@@ -0,0 +1,180 @@
+import re
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from openpyxl import load_workbook
+
+MONTH_MAP = {
+    "ENE": 1, "FEB": 2, "MAR": 3, "ABR": 4, "MAY": 5, "JUN": 6,
+    "JUL": 7, "AGO": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DIC": 12,
+}
+
+_RE_WS = re.compile(r"\s+")
+_RE_SPACED_LETTERS = re.compile(r"(?:[A-Za-zÁÉÍÓÚÜÑ]\s+)+[A-Za-zÁÉÍÓÚÜÑ]")
+_RE_PAREN_SUFFIX = re.compile(r"\s*\(.*?\)")
+_RE_YEAR = re.compile(r"(19|20)\d{2}")
+_RE_PARENS = re.compile(r"[()]")
+
+
+def squash_spaces(s: str) -> str:
+    """
+    Collapse whitespace; if it's just letters separated by spaces (e.g. 'T O T A L'),
+    remove the spaces completely.
+    """
+    s = _RE_WS.sub(" ", s.strip())
+    if _RE_SPACED_LETTERS.fullmatch(s):
+        s = s.replace(" ", "")
+    return s
+
+
+def norm_month(x):
+    """Normalize 'ENE', 'FEB', etc."""
+    if not isinstance(x, str):
+        return None
+    s = x.strip().upper()
+    s = _RE_PAREN_SUFFIX.sub("", s)
+    return s if s in MONTH_MAP else None
+
+
+def looks_like_year(cell) -> bool:
+    """Identify if a cell looks like a year."""
+    if cell is None:
+        return False
+    if isinstance(cell, float) and pd.isna(cell):
+        return False
+    if isinstance(cell, str) and cell.strip() == "":
+        return False
+    if isinstance(cell, (int, float)):
+        try:
+            y = int(round(float(cell)))
+            return 1900 <= y <= 2099
+        except Exception:
+            return False
+    if isinstance(cell, str):
+        return bool(_RE_YEAR.search(cell.strip()))
+    return False
+
+
+def extract_year(cell) -> int | None:
+    """Pull a 4-digit year out of the cell if possible."""
+    if isinstance(cell, (int, float)) and not pd.isna(cell):
+        try:
+            y = int(round(float(cell)))
+            if 1900 <= y <= 2099:
+                return y
+        except Exception:
+            return None
+
+    m = _RE_YEAR.search(str(cell))
+    return int(m.group(0)) if m else None
+
+
+def join_title(cells, col_idx: int) -> str:
+    """Merge stacked header cells into one column title."""
+    parts = [squash_spaces(str(v)) for v in cells if not pd.isna(v)]
+    title = " ".join(p for p in parts if p).replace("\n", " ").strip()
+    title = _RE_PARENS.sub("", title)
+    title = _RE_WS.sub(" ", title).strip()
+    return title or f"col_{col_idx}"
+
+
+def column_titles(df: pd.DataFrame, spec: dict[int, tuple[int, int]]) -> dict[int, str]:
+    """
+    Merged header titles for every column in spec ({col_idx: (first_row, last_row)},
+    1-indexed, inclusive) from a single slice of the header block.
+    """
+    cols = list(spec)
+    starts = np.array([spec[c][0] for c in cols])
+    ends = np.array([spec[c][1] for c in cols])
+    r0, r1 = starts.min() - 1, ends.max()
+
+    rows = np.arange(r0 + 1, r1 + 1)[:, None]
+    hdr = df.iloc[r0:r1, cols].where((rows >= starts) & (rows <= ends))
+
+    return {c: join_title(hdr.iloc[:, i].dropna(), c) for i, c in enumerate(cols)}
+
+
+def read_sheet(path: Path, ncols: int) -> pd.DataFrame:
+    """
+    First sheet as an object DataFrame with positional columns, streamed with
+    openpyxl's read-only reader and cut to the first ncols columns.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()
+        rows = list(ws.iter_rows(max_col=ncols, values_only=True))
+    finally:
+        wb.close()
+    return pd.DataFrame(rows, dtype=object)
+
+
+def build_schedule(df: pd.DataFrame,
+                   start_row_1idx: int,
+                   year_col_idx: int,
+                   month_col_idx: int) -> pd.DataFrame:
+    """
+    Year/month labels of every month row, indexed by row, for the messy
+    BCB Excel structure. Computed once per sheet and shared by all columns.
+    A year row opens a block and the month rows after it inherit that year,
+    up to and including DIC and at most 13. A year row reached while the
+    open block has no months yet is folded into that block, and a month on
+    the folded row itself counts for it.
+    """
+    body = df.iloc[start_row_1idx - 1:]
+
+    is_year = body.iloc[:, year_col_idx].map(looks_like_year).to_numpy(dtype=bool)
+    month = pd.to_numeric(body.iloc[:, month_col_idx].map(norm_month).map(MONTH_MAP), errors="coerce")
+    has_month = month.notna().to_numpy()
+
+    # only the year rows are walked; months between them are counted up front
+    before = np.concatenate([[0], np.cumsum(has_month & ~is_year)])
+    opens = np.zeros(len(body), dtype=bool)
+    filled, prev = True, 0
+    for r in np.flatnonzero(is_year):
+        if filled or before[r] > before[prev]:
+            opens[r], filled = True, False
+        else:
+            filled = has_month[r]
+        prev = r
+    opens = pd.Series(opens, index=body.index)
+    block = opens.cumsum()
+
+    year = body.iloc[:, year_col_idx].where(opens).map(extract_year, na_action="ignore")
+    year = pd.to_numeric(year, errors="coerce").ffill()
+    month = month.where(~opens & (block > 0))
+
+    is_dic = month.eq(12)
+    month = month.where(is_dic.groupby(block).cumsum().sub(is_dic).eq(0))
+    month = month.where(month.notna().groupby(block).cumsum().le(13))
+
+    keep = month.notna() & year.notna()
+    return pd.DataFrame({
+        "year": year[keep].astype(np.int16),
+        "month": month[keep].astype(np.int8),
+    })
+
+
+def extract_values(df: pd.DataFrame,
+                   schedule: pd.DataFrame,
+                   value_cols: list[int]) -> pd.DataFrame:
+    """Numeric values of value_cols at the scheduled month rows, on the schedule's index."""
+    return df.loc[schedule.index, value_cols].apply(pd.to_numeric, errors="coerce")
+
+
+def write_csv(df: pd.DataFrame, path: Path) -> None:
+    """
+    df as CSV through pyarrow's writer, laid out like df.to_csv(path, index=False):
+    unquoted header, timestamps as plain dates. Integral floats come out as
+    '0' rather than '0.0'; the values read back identically.
+    """
+    arrays = [pa.Array.from_pandas(df.iloc[:, i]) for i in range(df.shape[1])]
+    arrays = [a.cast(pa.date32()) if pa.types.is_timestamp(a.type) else a for a in arrays]
+    table = pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(df.iloc[:0].to_csv(index=False).encode())
+        pacsv.write_csv(table, f, pacsv.WriteOptions(include_header=False, quoting_style="needed"))
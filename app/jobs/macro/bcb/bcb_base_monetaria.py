@@ -1,160 +1,47 @@
-import re
 from pathlib import Path
-from functools import reduce
 import pandas as pd
 from pandas.tseries.offsets import MonthEnd
 
+from _parse_utils import build_schedule, column_titles, extract_values, read_sheet, write_csv
+
 SRC_XLSX = Path("data/macro/bcb_excels/01.xlsx")
 OUT_CSV  = Path("data/macro/clean/base_monetaria.csv")
-OUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-
-MONTH_MAP = {
-    "ENE": 1, "FEB": 2, "MAR": 3, "ABR": 4, "MAY": 5, "JUN": 6,
-    "JUL": 7, "AGO": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DIC": 12,
+N_COLS = 19
+
+TITLE_ROWS = {
+    2: (8, 12),
+    3: (9, 12), 4: (9, 12), 5: (9, 12), 6: (9, 12),
+    7: (10, 11), 8: (10, 11), 9: (10, 11),
+    13: (8, 12),
+    14: (9, 12),
+    15: (12, 12), 16: (12, 12), 17: (12, 12), 18: (12, 12),
 }
 
-def _squash_spaces(s: str) -> str:
-    s = re.sub(r"\s+", " ", s.strip())
-    if re.fullmatch(r"(?:[A-Za-zÁÉÍÓÚÜÑ]\s+)+[A-Za-zÁÉÍÓÚÜÑ]", s):
-        s = s.replace(" ", "")
-    return s
-
-def _norm_month(x):
-    if not isinstance(x, str):
-        return None
-    s = x.strip().upper()
-    s = re.sub(r"\s*\(.*?\)", "", s)
-    return s if s in MONTH_MAP else None
-
-def looks_like_year(cell) -> bool:
-    if cell is None:
-        return False
-    if isinstance(cell, float) and pd.isna(cell):
-        return False
-    if isinstance(cell, str) and cell.strip() == "":
-        return False
-    if isinstance(cell, (int, float)):
-        try:
-            y = int(round(float(cell)))
-            return 1900 <= y <= 2099
-        except Exception:
-            return False
-    if isinstance(cell, str):
-        return bool(re.search(r"(19|20)\d{2}", cell.strip()))
-    return False
-
-def extract_year(cell) -> int | None:
-    if isinstance(cell, (int, float)) and not pd.isna(cell):
-        try:
-            y = int(round(float(cell)))
-            if 1900 <= y <= 2099:
-                return y
-        except Exception:
-            return None
-    m = re.search(r"(19|20)\d{2}", str(cell))
-    return int(m.group(0)) if m else None
-
-def merged_title_from_rows(df: pd.DataFrame, col_idx: int, row_start_1idx: int, row_end_1idx: int) -> str:
-    r0 = row_start_1idx - 1
-    r1 = row_end_1idx
-    parts = []
-    for v in df.iloc[r0:r1, col_idx].tolist():
-        if pd.isna(v):
-            continue
-        s = _squash_spaces(str(v))
-        if s:
-            parts.append(s)
-    title = " ".join(parts).replace("\n", " ").strip()
-    title = re.sub(r"[()]", "", title)
-    title = re.sub(r"\s+", " ", title).strip()
-    return title or f"col_{col_idx}"
-
-def parse_value_series(df: pd.DataFrame, start_row_1idx: int, value_col_idx: int) -> pd.DataFrame:
-    i = start_row_1idx - 1
-    n = len(df)
-    out = []
-
-    while i < n:
-        while i < n and not looks_like_year(df.iat[i, 0]):
-            i += 1
-        if i >= n:
-            break
-
-        year = extract_year(df.iat[i, 0])
-        if year is None:
-            i += 1
-            continue
-
-        months_rows = []
-        j = i + 1
-        while j < n:
-            if looks_like_year(df.iat[j, 0]) and months_rows:
-                break
-            mlabel = _norm_month(df.iat[j, 1])
-            if mlabel is None:
-                j += 1
-                continue
-
-            months_rows.append((j, MONTH_MAP[mlabel]))
-
-            if mlabel == "DIC":
-                j += 1
-                break
-            if len(months_rows) > 12:
-                break
-            j += 1
-
-        if not months_rows:
-            i += 1
-            continue
-
-        for ridx, mnum in months_rows:
-            val = pd.to_numeric(df.iat[ridx, value_col_idx], errors="coerce")
-            out.append({"year": year, "month": mnum, "value": val})
-
-        i = j
-
-    return pd.DataFrame.from_records(out)
-
-def run():
-    raw = pd.read_excel(SRC_XLSX, header=None, dtype=object)
-
-    titles = {}
-    titles[2] = merged_title_from_rows(raw, 2, 8, 12)
-
-    for c in (3, 4, 5, 6):
-        titles[c] = merged_title_from_rows(raw, c, 9, 12)
+CACHE_DIR = Path("data/macro/bcb_excels/.cache")
+# bump whenever build_schedule or extract_values output changes, so cached frames are re-parsed
+PARSER_VERSION = 1
 
-    for c in (7, 8, 9):
-        titles[c] = merged_title_from_rows(raw, c, 10, 11)
+def cache_path(src: Path) -> Path:
+    """Parquet cache location for src, keyed by its mtime/size and PARSER_VERSION."""
+    st = src.stat()
+    key = f"{st.st_mtime_ns}-{st.st_size}-v{PARSER_VERSION}"
+    return CACHE_DIR / f"{src.stem}_{key}.parquet"
 
-    titles[13] = merged_title_from_rows(raw, 13, 8, 12)
-    titles[14] = merged_title_from_rows(raw, 14, 9, 12)
+def parse_sheet(src: Path) -> pd.DataFrame:
+    raw = read_sheet(src, N_COLS)
 
-    for c in (15, 16, 17, 18):
-        titles[c] = merged_title_from_rows(raw, c, 12, 12)
+    titles = column_titles(raw, TITLE_ROWS)
 
     parse_cols = list(range(2, 10)) + [13, 14, 15, 16, 17, 18]
 
-    series_dfs = []
-
-    for cidx in parse_cols:
-        dfc = parse_value_series(raw, start_row_1idx=13, value_col_idx=cidx)
-        if dfc.empty:
-            continue
-        name = titles.get(cidx, f"col_{cidx}")
-        dfc[name] = dfc["value"]
-        dfc = dfc[["year", "month", name]]
-        series_dfs.append(dfc)
-
-    if not series_dfs:
+    schedule = build_schedule(raw, start_row_1idx=13, year_col_idx=0, month_col_idx=1)
+    if schedule.empty:
         raise RuntimeError("No valid series extracted")
 
-    merged = reduce(lambda l, r: pd.merge(l, r, on=["year", "month"], how="outer"), series_dfs)
+    values = extract_values(raw, schedule, parse_cols)
+    values.columns = [titles.get(c, f"col_{c}") for c in parse_cols]
 
-    merged = merged.dropna(subset=["year", "month"], how="any")
-    merged["year"] = merged["year"].astype(int)
-    merged["month"] = merged["month"].astype(int)
+    merged = pd.concat([schedule, values], axis=1)
 
     merged["date"] = (
         pd.to_datetime(dict(year=merged["year"], month=merged["month"], day=1))
@@ -167,10 +54,23 @@ def run():
         .sort_values("date") \
         .reset_index(drop=True)
 
-    merged = merged.loc[:, ~merged.columns.str.startswith("Unnamed")]
     merged = merged.dropna(axis=1, how="all")
+    return merged
+
+def run():
+    cached = cache_path(SRC_XLSX)
+    if cached.exists():
+        merged = pd.read_parquet(cached)
+    else:
+        merged = parse_sheet(SRC_XLSX)
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        for stale in cached.parent.glob(f"{SRC_XLSX.stem}_*.parquet"):
+            stale.unlink()
+        merged.to_parquet(cached, index=False, compression="zstd")
+
+    value_cols = [c for c in merged.columns if c not in {"date", "year", "month"}]
 
-    merged.to_csv(OUT_CSV, index=False)
+    write_csv(merged, OUT_CSV)
     print(f"[OK] Wrote {OUT_CSV} with {len(merged)} rows and {len(value_cols)} series.")
     print("Columns included:")
     for c in merged.columns:
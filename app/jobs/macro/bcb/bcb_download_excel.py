@@ -2,16 +2,32 @@ import requests
 import re
 from pathlib import Path
 from io import BytesIO
+from email.utils import formatdate
+from concurrent.futures import ThreadPoolExecutor
 from PyPDF2 import PdfReader
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 INDEX_PDF_URL = "https://www.bcb.gob.bo/webdocs/publicacionesbcb/2025/11/25/%C3%8Dndice%20Boletin%20Mensual%20Septiembre%202025.pdf"
 BASE_URL = "https://www.bcb.gob.bo/webdocs/publicacionesbcb/2025/11/25/"
 DOWNLOAD_DIR = Path("data/macro/bcb_excels")
+MAX_WORKERS = 8
+CHUNK_SIZE = 1 << 16
+
+_RE_XLSX = re.compile(r"https?://\S+?\.(?:xls|xlsx)", re.IGNORECASE)
+
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.3),
+))
 
 def extract_excel_links_from_pdf(pdf_bytes: bytes):
     reader = PdfReader(BytesIO(pdf_bytes))
-    urls = []
+    urls = set()
     for page in reader.pages:
+        found = False
         if "/Annots" in page:
             for annot in page["/Annots"]:
                 obj = annot.get_object()
@@ -20,34 +36,49 @@ def extract_excel_links_from_pdf(pdf_bytes: bytes):
                     if isinstance(uri, bytes):
                         uri = uri.decode("utf-8", errors="ignore")
                     if uri.lower().endswith((".xls", ".xlsx")):
-                        urls.append(uri)
-        text = page.extract_text() or ""
-        urls += re.findall(r"https?://\S+?\.(?:xls|xlsx)", text, flags=re.IGNORECASE)
-    return sorted(set(urls))
+                        urls.add(uri)
+                        found = True
+        if not found:
+            urls.update(_RE_XLSX.findall(page.extract_text() or ""))
+    return sorted(urls)
+
+def _fetch(link: str) -> None:
+    if not link.startswith("http"):
+        link = BASE_URL + link.lstrip("./")
+    fname = link.split("/")[-1]
+    dest = DOWNLOAD_DIR / fname
+
+    headers = {}
+    if dest.exists():
+        headers["If-Modified-Since"] = formatdate(dest.stat().st_mtime, usegmt=True)
+
+    try:
+        with SESSION.get(link, headers=headers, stream=True, timeout=30) as r:
+            if r.status_code == 304:
+                print(f"Unchanged {fname}")
+                return
+            r.raise_for_status()
+            tmp = dest.with_name(dest.name + ".part")
+            with tmp.open("wb") as f:
+                for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+            tmp.replace(dest)
+        print(f"Downloaded {fname}")
+    except Exception as e:
+        print(f"Failed {fname}: {e}")
 
 def main():
     print("📄 Downloading index PDF …")
-    resp = requests.get(INDEX_PDF_URL, timeout=30)
+    resp = SESSION.get(INDEX_PDF_URL, timeout=30)
     resp.raise_for_status()
 
     print("🔗 Extracting Excel links from PDF …")
     links = extract_excel_links_from_pdf(resp.content)
     print(f"Found {len(links)} Excel link(s)")
 
-    for link in links:
-        if not link.startswith("http"):
-            link = BASE_URL + link.lstrip("./")
-        fname = link.split("/")[-1]
-        dest = DOWNLOAD_DIR / fname
-        DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
-        try:
-            r = requests.get(link, timeout=30)
-            r.raise_for_status()
-            dest.write_bytes(r.content)
-            print(f"Downloaded {fname}")
-        except Exception as e:
-            print(f"Failed {fname}: {e}")
+    DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        list(ex.map(_fetch, links))
 
     print("\n🎉 Done! All Excel files saved to:", DOWNLOAD_DIR.resolve())
 
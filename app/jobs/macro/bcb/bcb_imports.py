@@ -1,131 +1,18 @@
-import re
-import math
 from pathlib import Path
-from functools import reduce
 
 import pandas as pd
 from pandas.tseries.offsets import MonthEnd
 
+from _parse_utils import build_schedule, extract_values, read_sheet, write_csv
+
 
 SRC_XLSX = Path("data/macro/bcb_excels/24.xlsx")
 OUT_CSV  = Path("data/macro/clean/imports.csv")
-OUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-
-
-MONTH_MAP = {
-    "ENE": 1, "FEB": 2, "MAR": 3, "ABR": 4, "MAY": 5, "JUN": 6,
-    "JUL": 7, "AGO": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DIC": 12,
-}
-
-def _squash_spaces(s: str) -> str:
-    """
-    Collapse whitespace; if it's just letters separated by spaces (e.g. 'T O T A L'),
-    remove the spaces completely.
-    """
-    s = re.sub(r"\s+", " ", s.strip())
-    if re.fullmatch(r"(?:[A-Za-zÁÉÍÓÚÜÑ]\s+)+[A-Za-zÁÉÍÓÚÜÑ]", s):
-        s = s.replace(" ", "")
-    return s
-
-def _norm_month(x):
-    if not isinstance(x, str):
-        return None
-    s = x.strip().upper()
-    s = re.sub(r"\s*\(.*?\)", "", s)
-    return s if s in MONTH_MAP else None
-
-def looks_like_year(cell) -> bool:
-    if cell is None:
-        return False
-    if isinstance(cell, float) and math.isnan(cell):
-        return False
-    if isinstance(cell, str) and cell.strip() == "":
-        return False
-    if isinstance(cell, (int, float)):
-        try:
-            y = int(round(float(cell)))
-        except Exception:
-            return False
-        return 1900 <= y <= 2099
-    if isinstance(cell, str):
-        return bool(re.search(r"(19|20)\d{2}", cell.strip()))
-    return False
-
-def extract_year(cell) -> int | None:
-    """Pull a 4-digit year out of the cell if possible."""
-    if isinstance(cell, (int, float)) and not (isinstance(cell, float) and math.isnan(cell)):
-        try:
-            y = int(round(float(cell)))
-            if 1900 <= y <= 2099:
-                return y
-        except Exception:
-            return None
-    m = re.search(r"(19|20)\d{2}", str(cell))
-    return int(m.group(0)) if m else None
-
-def parse_value_series(
-    df: pd.DataFrame,
-    start_row_1idx: int,
-    year_col_idx: int,
-    month_col_idx: int,
-    value_col_idx: int,
-) -> pd.DataFrame:
-    """
-    Generic parser: find a 'year' row in year_col_idx, then consume following
-    month rows (month_col_idx) and extract values from value_col_idx.
-    """
-    i = start_row_1idx - 1
-    n = len(df)
-    out: list[dict] = []
-
-    while i < n:
-        while i < n and not looks_like_year(df.iat[i, year_col_idx]):
-            i += 1
-        if i >= n:
-            break
-
-        year = extract_year(df.iat[i, year_col_idx])
-        if year is None:
-            i += 1
-            continue
-
-        months_rows: list[tuple[int, int]] = []
-        j = i + 1
-        while j < n:
-            if looks_like_year(df.iat[j, year_col_idx]) and months_rows:
-                break
-
-            mlabel = _norm_month(df.iat[j, month_col_idx])
-            if mlabel is None:
-                j += 1
-                continue
-
-            months_rows.append((j, MONTH_MAP[mlabel]))
-
-            if mlabel == "DIC":
-                j += 1
-                break
-
-            if len(months_rows) > 12:
-                break
-
-            j += 1
-
-        if not months_rows:
-            i += 1
-            continue
-
-        for ridx, mnum in months_rows:
-            val = pd.to_numeric(df.iat[ridx, value_col_idx], errors="coerce")
-            out.append({"year": year, "month": mnum, "value": val})
-
-        i = j
-
-    return pd.DataFrame.from_records(out)
+N_COLS = 22
 
 
 def run():
-    raw = pd.read_excel(SRC_XLSX, header=None, dtype=object)
+    raw = read_sheet(SRC_XLSX, N_COLS)
 
     titles: dict[int, str] = {
         2:  "BienesConsumo_NoDuradero",
@@ -155,35 +42,14 @@ def run():
     }
 
     parse_cols = sorted(titles.keys())
-    series_dfs: list[pd.DataFrame] = []
-
-    for cidx in parse_cols:
-        dfc = parse_value_series(
-            raw,
-            start_row_1idx=10,
-            year_col_idx=1,
-            month_col_idx=1,
-            value_col_idx=cidx,
-        )
-        if dfc.empty:
-            continue
-
-        name = titles[cidx]
-        dfc[name] = dfc["value"]
-        dfc = dfc[["year", "month", name]]
-        series_dfs.append(dfc)
-
-    if not series_dfs:
+    schedule = build_schedule(raw, start_row_1idx=10, year_col_idx=1, month_col_idx=1)
+    if schedule.empty:
         raise RuntimeError("No valid series extracted for imports")
 
-    merged = reduce(
-        lambda l, r: pd.merge(l, r, on=["year", "month"], how="outer"),
-        series_dfs,
-    )
+    values = extract_values(raw, schedule, parse_cols)
+    values.columns = [titles[c] for c in parse_cols]
 
-    merged = merged.dropna(subset=["year", "month"], how="any").copy()
-    merged["year"] = merged["year"].astype(int)
-    merged["month"] = merged["month"].astype(int)
+    merged = pd.concat([schedule, values], axis=1)
 
     merged["date"] = (
         pd.to_datetime(
@@ -198,10 +64,9 @@ def run():
         .reset_index(drop=True)
     )
 
-    merged = merged.loc[:, ~merged.columns.str.startswith("Unnamed")]
     merged = merged.dropna(axis=1, how="all")
 
-    merged.to_csv(OUT_CSV, index=False)
+    write_csv(merged, OUT_CSV)
     print(f"[OK] Wrote {OUT_CSV} with {len(merged)} rows and {len(value_cols)} series.")
     print("Columns included:")
     for c in merged.columns:
@@ -1,10 +1,14 @@
-import csv, json, sys, time, re
+import json, sys, re
 from datetime import datetime, date
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import calendar
 
+import pandas as pd
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 BASE_URL = "https://www.bcb.gob.bo/?q=indicadores_inflacion"
 PAGE_URL = "https://www.bcb.gob.bo/?q=indicadores_inflacion&page={page}"
@@ -14,17 +18,35 @@ LATEST_JSON = OUT_DIR / "bcb_inflation_latest.json"
 
 BACKFILL_START = date(2008, 1, 1)  
 MAX_PAGES = 100
+FETCH_WORKERS = 8
+
+VALUE_FIELDS = ("ipc_base2016", "ipc_base2007", "infl_mom", "infl_ytd", "infl_yoy")
+FIELDS = [*VALUE_FIELDS, "source_url", "fetched_at"]
+ROLE_POS = {"ipc2016": 0, "ipc2007": 1, "mensual": 2, "acumulada": 3, "anual": 4}
+DECIMALS = {"ipc_base2016": 2, "ipc_base2007": 2, "infl_mom": 6, "infl_ytd": 6, "infl_yoy": 6}
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; BET/1.0; +https://github.com/nicoortuno/bolivian-economy-tracker)"
 }
 
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=1.5, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
 MONTHS_ES = {
     "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
     "julio": 7, "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10,
     "noviembre": 11, "diciembre": 12
 }
 
+_DATE_ES = re.compile(r"([a-záéíóúñ]+)\s+(\d{4})", re.IGNORECASE)
+_DATE_NUM = re.compile(r"(\d{1,2})/(\d{4})")
+_DECIMAL_COMMA = str.maketrans({".": None, ",": "."})
+
 def last_day_of_month(year, month):
     return calendar.monthrange(year, month)[1]
 
@@ -32,18 +54,16 @@ def _norm_num(s):
     if s is None: return None
     s = s.strip()
     if s == "": return None
-    if s.endswith("%"):
-        s2 = s[:-1].strip().replace(".", "").replace(",", ".")
-        try: return float(s2) / 100.0
-        except ValueError: return None
-    s2 = s.replace(".", "").replace(",", ".")
-    try: return float(s2)
+    pct = s.endswith("%")
+    if pct: s = s[:-1].strip()
+    try: v = float(s.translate(_DECIMAL_COMMA))
     except ValueError: return None
+    return v / 100.0 if pct else v
 
 def _parse_date(label):
     t = (label or "").strip().lower()
 
-    m = re.match(r"([a-záéíóúñ]+)\s+(\d{4})", t, re.IGNORECASE)
+    m = _DATE_ES.match(t)
     if m:
         mon_name, year = m.group(1), int(m.group(2))
         mon = MONTHS_ES.get(mon_name)
@@ -51,7 +71,7 @@ def _parse_date(label):
             ld = last_day_of_month(year, mon)
             return f"{year:04d}-{mon:02d}-{ld:02d}"
 
-    m = re.match(r"(\d{1,2})/(\d{4})", t)
+    m = _DATE_NUM.match(t)
     if m:
         mon, year = int(m.group(1)), int(m.group(2))
         ld = last_day_of_month(year, mon)
@@ -65,19 +85,13 @@ def _parse_date(label):
         return None
 
 
-def fetch(url, retries=3, backoff=1.5):
-    last = None
-    for i in range(retries):
-        try:
-            r = requests.get(url, headers=HEADERS, timeout=30)
-            r.raise_for_status()
-            if not r.encoding or r.encoding.lower() == 'iso-8859-1':
-                r.encoding = r.apparent_encoding or 'utf-8'
-            return r.text
-        except Exception as e:
-            last = e
-            time.sleep(backoff ** (i+1))
-    raise last
+def fetch(url):
+    r = SESSION.get(url, timeout=30)
+    r.raise_for_status()
+    # requests falls back to iso-8859-1 when the header has no charset; the site serves UTF-8
+    if 'charset' not in r.headers.get('content-type', '').lower():
+        r.encoding = 'utf-8'
+    return r.text
 
 def _header_roles(table):
     ths = table.find_all("th")
@@ -95,7 +109,7 @@ def _header_roles(table):
     return roles
 
 def parse_table(html):
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(html, "lxml")
     candidates = []
     for tbl in soup.find_all("table"):
         headers = [th.get_text(" ", strip=True).lower() for th in tbl.find_all("th")]
@@ -123,85 +137,52 @@ def parse_table(html):
         dkey = _parse_date(cells[0])
         if not dkey: continue
 
-        rec = {
-            "date": dkey,
-            "ipc_base2016": None,
-            "ipc_base2007": None,
-            "infl_mom": None,
-            "infl_ytd": None,
-            "infl_yoy": None,
-        }
+        vals = [None] * 5
 
         for idx, raw in enumerate(cells):
             role = roles[idx] if idx < len(roles) else ""
             if idx > 0 and role == "":
                 if "%" in raw:
-                    if rec["infl_mom"] is None: role = "mensual"
-                    elif rec["infl_ytd"] is None: role = "acumulada"
+                    if vals[2] is None: role = "mensual"
+                    elif vals[3] is None: role = "acumulada"
                     else: role = "anual"
                 else:
-                    role = "ipc2016" if rec["ipc_base2016"] is None else ("ipc2007" if rec["ipc_base2007"] is None else "")
+                    role = "ipc2016" if vals[0] is None else ("ipc2007" if vals[1] is None else "")
 
-            if role == "ipc2016": rec["ipc_base2016"] = _norm_num(raw)
-            elif role == "ipc2007": rec["ipc_base2007"] = _norm_num(raw)
-            elif role == "mensual": rec["infl_mom"] = _norm_num(raw)
-            elif role == "acumulada": rec["infl_ytd"] = _norm_num(raw)
-            elif role == "anual": rec["infl_yoy"] = _norm_num(raw)
+            pos = ROLE_POS.get(role)
+            if pos is not None: vals[pos] = _norm_num(raw)
 
-        if any(rec[k] is not None for k in ["ipc_base2016","ipc_base2007","infl_mom","infl_ytd","infl_yoy"]):
-            out[dkey] = rec
+        if any(v is not None for v in vals):
+            out[dkey] = {"date": dkey, **dict(zip(VALUE_FIELDS, vals))}
     return out
 
+def fetch_page(p):
+    url = BASE_URL if p == 0 else PAGE_URL.format(page=p)
+    return parse_table(fetch(url))
+
 def fetch_all_pages():
     merged = {}
-    for p in range(0, MAX_PAGES):
-        url = BASE_URL if p == 0 else PAGE_URL.format(page=p)
-        html = fetch(url)
-        chunk = parse_table(html)
-        if not chunk:
-            break
-        merged.update(chunk)
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as ex:
+        for start in range(0, MAX_PAGES, FETCH_WORKERS):
+            pages = range(start, min(start + FETCH_WORKERS, MAX_PAGES))
+            for chunk in ex.map(fetch_page, pages):
+                if not chunk:
+                    return merged
+                merged.update(chunk)
     return merged
 
 def read_existing(path):
-    if not path.exists(): return {}
-    out = {}
-    with path.open("r", newline="", encoding="utf-8") as f:
-        rd = csv.DictReader(f)
-        for r in rd:
-            out[r["date"]] = r
-    return out
+    if not path.exists():
+        return pd.DataFrame(columns=FIELDS, index=pd.Index([], name="date"))
+    return pd.read_csv(path, dtype=str, keep_default_na=False, index_col="date")
 
-def month_iter(d0: date, d1: date):
-    y, m = d0.year, d0.month
-    while (y < d1.year) or (y == d1.year and m <= d1.month):
-        yield date(y, m, 1)
-        m += 1
-        if m == 13:
-            m = 1
-            y += 1
+def _fmt(col):
+    dec = DECIMALS[col.name]
+    return col.map(lambda x: f"{x:.{dec}f}", na_action="ignore")
 
-def _fmt(x, dec):
-    return "" if x is None else f"{x:.{dec}f}"
-
-def write_csv(path, rows):
+def write_csv(path, df):
     path.parent.mkdir(parents=True, exist_ok=True)
-    fieldnames = [
-        "date",
-        "ipc_base2016",
-        "ipc_base2007",
-        "infl_mom",
-        "infl_ytd",
-        "infl_yoy",
-        "source_url",
-        "fetched_at"
-    ]
-    rows_sorted = sorted(rows, key=lambda r: r["date"])
-    with path.open("w", newline="", encoding="utf-8") as f:
-        wr = csv.DictWriter(f, fieldnames=fieldnames)
-        wr.writeheader()
-        for r in rows_sorted:
-            wr.writerow(r)
+    df.sort_index().to_csv(path, index_label="date", lineterminator="\r\n")
 
 def main():
     fetched_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
@@ -213,40 +194,21 @@ def main():
     latest_dt = datetime.fromisoformat(latest_key).date()
 
     existing = read_existing(CSV_PATH)
-    merged = {**existing}
-
-    for d, r in parsed_all.items():
-        prev = merged.get(d, {})
-        merged[d] = {
-            **prev,
-            "date": d,
-            "ipc_base2016": _fmt(r["ipc_base2016"], 2) if r["ipc_base2016"] is not None else (prev.get("ipc_base2016") or ""),
-            "ipc_base2007": _fmt(r["ipc_base2007"], 2) if r["ipc_base2007"] is not None else (prev.get("ipc_base2007") or ""),
-            "infl_mom": _fmt(r["infl_mom"], 6) if r["infl_mom"] is not None else (prev.get("infl_mom") or ""),
-            "infl_ytd": _fmt(r["infl_ytd"], 6) if r["infl_ytd"] is not None else (prev.get("infl_ytd") or ""),
-            "infl_yoy": _fmt(r["infl_yoy"], 6) if r["infl_yoy"] is not None else (prev.get("infl_yoy") or ""),
-            "source_url": BASE_URL,
-            "fetched_at": fetched_at
-        }
-
-    for dt in month_iter(BACKFILL_START, latest_dt):
-        key = f"{dt.year:04d}-{dt.month:02d}-01"
-        if key not in merged:
-            merged[key] = {
-                "date": key,
-                "ipc_base2016": "",
-                "ipc_base2007": "",
-                "infl_mom": "",
-                "infl_ytd": "",
-                "infl_yoy": "",
-                "source_url": BASE_URL,
-                "fetched_at": fetched_at
-            }
-
-    write_csv(CSV_PATH, list(merged.values()))
-
-    latest_date = max(merged.keys())
-    latest = merged[latest_date]
+
+    parsed = pd.DataFrame.from_dict(parsed_all, orient="index", columns=list(VALUE_FIELDS)).astype(float)
+    parsed = parsed.apply(_fmt).assign(source_url=BASE_URL, fetched_at=fetched_at)
+    merged = parsed.combine_first(existing.mask(existing.eq("")))
+
+    backfill = pd.date_range(BACKFILL_START, latest_dt, freq="MS").strftime("%Y-%m-%d")
+    backfill = backfill.difference(merged.index)
+    blank = pd.DataFrame({"source_url": BASE_URL, "fetched_at": fetched_at}, index=backfill)
+    merged = pd.concat([merged, blank]).reindex(columns=FIELDS).fillna("")
+    merged.index.name = "date"
+
+    write_csv(CSV_PATH, merged)
+
+    latest_date = merged.index.max()
+    latest = {"date": latest_date, **merged.loc[latest_date].to_dict()}
     OUT_DIR.mkdir(parents=True, exist_ok=True)
     with LATEST_JSON.open("w", encoding="utf-8") as f:
         json.dump(latest, f, ensure_ascii=False, indent=2)
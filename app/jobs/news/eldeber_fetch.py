@@ -4,11 +4,17 @@ Fetch El Deber Economía articles and write:
   data/raw/news/eldeber/<YYYY-MM-DD>/<hash>.json
 """
 
-import re, json, time, hashlib, argparse, datetime as dt
+import io, re, time, hashlib, argparse, threading, datetime as dt
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
+import orjson
+import pyarrow.parquet as pq
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dateutil import parser as dtparse
 import unicodedata
 import zoneinfo
@@ -19,8 +25,24 @@ HEADERS = {"User-Agent": USER_AGENT}
 REQ_KW = dict(timeout=30)
 SITEMAP_URL = "https://eldeber.com.bo/sitemap-news.xml"
 
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=1.5, status_forcelist=[429, 500, 502, 503, 504],
+                      raise_on_status=False),
+))
+
 RAW_BASE = Path("data/raw/news/eldeber")
+CURATED_DIR = Path("data/curated/news")
 ARTICLE_RE = re.compile(r"^https?://eldeber\.com\.bo/economia/[^/]+_\d+/?$", re.I)
+_WS_RE = re.compile(r"\s+")
+_TITLE_SUFFIX_RE = re.compile(r"\s*\|\s*EL\s*DEBER.*$", re.I)
+_DATE_HINT_RE = re.compile(
+    r"(publicado|actualizado|fecha|sabado|sábado|domingo|lunes|martes|miercoles|miércoles|jueves|viernes)",
+    re.I
+)
 
 _ES_MONTHS = {
     "enero":1, "febrero":2, "marzo":3, "abril":4, "mayo":5, "junio":6,
@@ -36,6 +58,53 @@ _ES_DT_RE = re.compile(
     re.IGNORECASE
 )
 
+def _has_class(*names: str) -> str:
+    """XPath predicate matching any of the CSS class names."""
+    return " or ".join(f"contains(concat(' ', normalize-space(@class), ' '), ' {n} ')" for n in names)
+
+_BAD_BLOCK = (
+    "self::aside or self::nav or self::footer or self::header or "
+    + _has_class("link-nota-propia", "mas-leidas", "ultimas-noticias", "tags", "container-spot", "ads", "advertising")
+)
+
+_XP_TEXT = etree.XPath(".//text()[not(ancestor::script or ancestor::style or ancestor::template)]")
+_XP_OG_TITLE = etree.XPath('//meta[@property="og:title"]')
+_XP_H1 = etree.XPath("//h1")
+_XP_TITLE = etree.XPath("//title")
+_XP_DATE_META = (
+    (etree.XPath('//meta[@property="article:published_time"]'), "content"),
+    (etree.XPath('//meta[@name="pubdate"]'), "content"),
+    (etree.XPath('//meta[@name="date"]'), "content"),
+    (etree.XPath("//time"), "datetime"),
+)
+_XP_DATE_TEXT = tuple(etree.XPath(xp) for xp in (
+    "//header",
+    *(f"//*[{_has_class(c)}]" for c in (
+        "articulo__header", "articulo__meta", "articulo__fecha", "nota__fecha", "notapage__container",
+    )),
+    "//article",
+))
+_XP_ARTICLE = tuple(etree.XPath(xp) for xp in (
+    f"//div[{_has_class('notapage__container')}]//article[{_has_class('articulo')}]",
+    f"//article[{_has_class('articulo')}]",
+    "//article",
+))
+_XP_DROP = etree.XPath(
+    ".//*[self::aside or self::nav or self::footer or self::header or contains(@id, 'ad-') or contains(@class, 'ad-') or "
+    + _has_class("link-nota-propia", "mas-leidas", "ultimas-noticias", "tags", "container-spot", "ads")
+    + "]"
+)
+_XP_BODY = etree.XPath(f".//main[{_has_class('articulo__cuerpo')}]")
+_XP_PARAS = etree.XPath(f".//p[not(ancestor::*[{_BAD_BLOCK}])]")
+
+def _text(el) -> str:
+    """Text of el like BeautifulSoup's get_text(" ", strip=True)."""
+    return " ".join(t for t in (t.strip() for t in _XP_TEXT(el)) if t)
+
+def _first(xp, el):
+    found = xp(el)
+    return found[0] if found else None
+
 def _parse_spanish_datetime(text: str) -> str | None:
     """
     Parse Spanish date strings like:
@@ -65,6 +134,13 @@ def _parse_spanish_datetime(text: str) -> str | None:
     dt_local = dt.datetime(year, month, day, hour, minute, tzinfo=tz)
     return dt_local.isoformat() 
 
+def _parse_iso(s: str) -> dt.datetime:
+    """ISO-8601 through the C fromisoformat; dateutil only for anything else."""
+    try:
+        return dt.datetime.fromisoformat(s)
+    except ValueError:
+        return dtparse.parse(s)
+
 def sha16(s: str) -> str:
     return hashlib.sha256(s.encode("utf-8")).hexdigest()[:16]
 
@@ -72,29 +148,27 @@ def ensure_dir(p: Path):
     p.mkdir(parents=True, exist_ok=True)
 
 def fetch(url: str) -> requests.Response:
-    r = requests.get(url, headers=HEADERS, allow_redirects=True, **REQ_KW)
-    if not r.encoding or r.encoding.lower() == "iso-8859-1":
-        try:
-            r.encoding = r.apparent_encoding
-        except Exception:
-            pass
+    r = SESSION.get(url, allow_redirects=True, **REQ_KW)
+    # requests falls back to iso-8859-1 when the header has no charset; the site serves UTF-8
+    if "charset" not in r.headers.get("content-type", "").lower():
+        r.encoding = "utf-8"
     return r
 
 def _norm(s: str) -> str:
     s2 = unicodedata.normalize("NFKD", s).encode("ascii","ignore").decode("ascii")
-    return re.sub(r"\s+", " ", s2).strip().lower()
+    return _WS_RE.sub(" ", s2).strip().lower()
 
-def parse_sitemap_xml(xml_text: str):
-    soup = BeautifulSoup(xml_text, "xml")
-    for url in soup.find_all("url"):
-        loc = url.loc.get_text(strip=True) if url.loc else None
-        lastmod = url.lastmod.get_text(strip=True) if url.lastmod else None
+def parse_sitemap_xml(xml_bytes: bytes):
+    for _, url in etree.iterparse(io.BytesIO(xml_bytes), tag="{*}url"):
+        loc = (url.findtext("{*}loc") or "").strip()
+        lastmod = url.findtext("{*}lastmod")
+        url.clear()
         if loc:
-            yield {"url": loc, "lastmod": lastmod}
+            yield {"url": loc, "lastmod": lastmod.strip() if lastmod is not None else None}
 
 def iter_economia_article_urls():
     r = fetch(SITEMAP_URL); r.raise_for_status()
-    for item in parse_sitemap_xml(r.text):
+    for item in parse_sitemap_xml(r.content):
         u = item["url"]
         if ARTICLE_RE.match(u):
             yield u, item.get("lastmod")
@@ -105,87 +179,68 @@ def extract_article(url: str):
     r = fetch(url)
     if r.status_code != 200 or not r.text:
         return None
-    soup = BeautifulSoup(r.text, "html.parser")
+    try:
+        # bytes + the response encoding: lxml rejects str input that carries an XML encoding declaration
+        doc = lxml_html.document_fromstring(r.content, parser=lxml_html.HTMLParser(encoding=r.encoding))
+    except (etree.ParserError, ValueError):
+        return None
 
     title = None
-    ogt = soup.find("meta", property="og:title")
-    if ogt and ogt.get("content"):
-        title = ogt["content"].strip()
+    ogt = _first(_XP_OG_TITLE, doc)
+    if ogt is not None and ogt.get("content"):
+        title = ogt.get("content").strip()
+    if not title:
+        h1 = _first(_XP_H1, doc)
+        if h1 is not None:
+            title = _text(h1)
     if not title:
-        h1 = soup.find("h1")
-        if h1:
-            title = h1.get_text(" ", strip=True)
-    if not title and soup.title:
-        title = soup.title.get_text(" ", strip=True)
+        t = _first(_XP_TITLE, doc)
+        if t is not None:
+            title = _text(t)
     if title:
-        title = re.sub(r"\s*\|\s*EL\s*DEBER.*$", "", title, flags=re.I).strip()
+        title = _TITLE_SUFFIX_RE.sub("", title).strip()
 
     published_at: str | None = None
 
-    for sel, attr in [
-        ('meta[property="article:published_time"]', "content"),
-        ('meta[name="pubdate"]', "content"),
-        ('meta[name="date"]', "content"),
-        ("time", "datetime"),
-    ]:
-        tag = soup.select_one(sel)
-        if tag and tag.get(attr):
+    for xp, attr in _XP_DATE_META:
+        tag = _first(xp, doc)
+        if tag is not None and tag.get(attr):
             try:
-                published_at = dtparse.parse(tag.get(attr).strip()).astimezone(dt.timezone.utc).isoformat()
+                published_at = _parse_iso(tag.get(attr).strip()).astimezone(dt.timezone.utc).isoformat()
                 break
             except Exception:
                 pass
 
     if not published_at:
         candidates = []
-        for sel in [
-            "header", ".articulo__header", ".articulo__meta", ".articulo__fecha",
-            ".nota__fecha", ".notapage__container", "article"
-        ]:
-            for node in soup.select(sel):
-                txt = node.get_text(" ", strip=True)
+        for xp in _XP_DATE_TEXT:
+            for node in xp(doc):
+                txt = _text(node)
                 if txt:
                     candidates.append(txt)
-        candidates.append(soup.get_text(" ", strip=True))
+        candidates.append(_text(doc))
 
         for txt in candidates:
-            if re.search(r"(publicado|actualizado|fecha|sabado|sábado|domingo|lunes|martes|miercoles|miércoles|jueves|viernes)", txt, re.I):
+            if _DATE_HINT_RE.search(txt):
                 iso = _parse_spanish_datetime(txt)
                 if iso:
                     published_at = iso
                     break
 
-    article = soup.select_one("div.notapage__container article.articulo") \
-              or soup.select_one("article.articulo") \
-              or soup.find("article")
-    if not article:
+    article = next((a for a in (_first(xp, doc) for xp in _XP_ARTICLE) if a is not None), None)
+    if article is None:
         return None
 
-    for sel in [
-        "aside", ".link-nota-propia", ".mas-leidas", ".ultimas-noticias",
-        ".tags", ".container-spot", ".ads", "[id*='ad-']", "[class*='ad-']",
-        "nav", "footer", "header"
-    ]:
-        for n in article.select(sel):
-            try: n.decompose()
-            except Exception: pass
-
-    body = article.select_one("main.articulo__cuerpo") or article
-    BAD_ANCESTOR = {"link-nota-propia","mas-leidas","ultimas-noticias","tags","container-spot","ads","advertising"}
-
-    def has_bad_ancestor(node):
-        cur, hops = node.parent, 0
-        while cur is not None and hops < 12:
-            if cur.name in ("aside","nav","footer","header"): return True
-            clz = cur.get("class", []) if hasattr(cur, "get") else []
-            if any(c in BAD_ANCESTOR for c in clz): return True
-            cur = cur.parent; hops += 1
-        return False
+    for n in _XP_DROP(article):
+        n.drop_tree()
 
+    body = _first(_XP_BODY, article)
+    if body is None:
+        body = article
     raw = []
-    for p in body.find_all("p"):
-        t = p.get_text(" ", strip=True)
-        if t and len(t) >= 20 and not has_bad_ancestor(p): raw.append(t)
+    for p in _XP_PARAS(body):
+        t = _text(p)
+        if t and len(t) >= 20: raw.append(t)
 
     BAD_PREFIX = ("¿quiere recibir notificaciones","quiere recibir notificaciones","clasificados","mustang cloud","copyright")
     paras = [t for t in raw if not _norm(t).startswith(BAD_PREFIX)]
@@ -216,48 +271,87 @@ def extract_article(url: str):
 def _day_from_iso(s: str | None) -> str | None:
     if not s: return None
     try:
-        return dtparse.parse(s).date().isoformat()
+        return _parse_iso(s).date().isoformat()
     except Exception:
         return None
 
+def _saved_lastmods() -> dict[str, str | None]:
+    """
+    Sitemap lastmod stored with every curated article, keyed by its url hash.
+    Read from the curated partitions, which CI commits (the raw JSON is not);
+    None for articles curated before lastmod was recorded.
+    """
+    saved: dict[str, str | None] = {}
+    for f in sorted(CURATED_DIR.glob("day=*/news.parquet")):
+        cols = [c for c in ("url_hash", "lastmod") if c in pq.read_schema(f).names]
+        t = pq.read_table(f, columns=cols).to_pydict()
+        for h, lm in zip(t["url_hash"], t.get("lastmod") or [None] * len(t["url_hash"])):
+            if lm is not None or h not in saved:
+                saved[h] = lm
+    return saved
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--limit", type=int, default=30)
     ap.add_argument("--since-hours", type=int, default=72)
     ap.add_argument("--sleep-ms", type=int, default=800)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--refetch", action="store_true", help="Fetch URLs already curated again")
     args = ap.parse_args()
 
     cutoff = None
     if args.since_hours and args.since_hours > 0:
         cutoff = dt.datetime.utcnow() - dt.timedelta(hours=args.since_hours)
 
+    curated = {} if args.refetch else _saved_lastmods()
+
     picked = []
     for url, lastmod in iter_economia_article_urls():
-        if cutoff and lastmod:
+        lm = None
+        if lastmod:
             try:
-                lm = dtparse.parse(lastmod)
+                lm = _parse_iso(lastmod)
                 if lm.tzinfo is None: lm = lm.replace(tzinfo=dt.timezone.utc)
-                if lm < cutoff.replace(tzinfo=lm.tzinfo): continue
             except Exception:
-                pass
-        picked.append(url)
-        if len(picked) >= args.limit: break
+                lm = None
+        if cutoff and lm and lm < cutoff.replace(tzinfo=lm.tzinfo): continue
 
-    saved = 0
-    for url in picked:
         h = sha16(url)
-        art = extract_article(url)
-        if not art or (not art.get("title") and not art.get("text")): continue
+        if h in curated and (lastmod is None or curated[h] == lastmod): continue
+        picked.append((url, lastmod))
+        if len(picked) >= args.limit: break
 
-        day = _day_from_iso(art.get("published_at")) \
-           or _day_from_iso(art.get("fetched_at")) \
-           or dt.datetime.utcnow().date().isoformat()
+    # request starts are spaced sleep_ms apart across all workers, so the
+    # pool never hits the site faster than the old serial loop did
+    pace = args.sleep_ms / 1000.0
+    pace_lock = threading.Lock()
+    next_start = time.monotonic()
+
+    def fetch_one(item):
+        nonlocal next_start
+        url, lastmod = item
+        with pace_lock:
+            now = time.monotonic()
+            start, next_start = max(now, next_start), max(now, next_start) + pace
+        time.sleep(max(0.0, start - now))
+        art = extract_article(url)
+        if art:
+            art["lastmod"] = lastmod
+        return url, art
 
-        out_dir = RAW_BASE / day
-        ensure_dir(out_dir)
-        (out_dir / f"{h}.json").write_text(json.dumps(art, ensure_ascii=False, indent=2))
-        saved += 1
-        time.sleep(args.sleep_ms / 1000.0)
+    saved = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        for url, art in ex.map(fetch_one, picked):
+            if not art or (not art.get("title") and not art.get("text")): continue
+
+            day = _day_from_iso(art.get("published_at")) \
+               or _day_from_iso(art.get("fetched_at")) \
+               or dt.datetime.utcnow().date().isoformat()
+
+            out_dir = RAW_BASE / day
+            ensure_dir(out_dir)
+            (out_dir / f"{sha16(url)}.json").write_bytes(orjson.dumps(art, option=orjson.OPT_INDENT_2))
+            saved += 1
 
     print(f"[eldeber] saved={saved} into {RAW_BASE}")
 
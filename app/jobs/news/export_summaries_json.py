@@ -14,7 +14,7 @@ Output:
 from __future__ import annotations
 from pathlib import Path
 from datetime import timezone
-import json
+import orjson
 import pandas as pd
 
 LATEST_PARQUET   = Path("data/curated/news/news_latest.parquet")
@@ -50,30 +50,30 @@ def main():
         ascending=[False, False, False]
     )
 
-    def row_to_obj(r):
-        pub = r.get("published_at")
-        fet = r.get("fetched_at")
+    def row_to_obj(source, title, url, summary, tags, sentiment, pub, fet, day):
         return {
-            "source": r.get("source"),
-            "title": r.get("title"),
-            "url": r.get("url"),
-            "summary": r.get("summary"),
-            "tags": (list(r["tags"]) if isinstance(r.get("tags"), (list, tuple)) else r.get("tags")),
-            "sentiment": r.get("sentiment"),
+            "source": source,
+            "title": title,
+            "url": url,
+            "summary": summary,
+            "tags": (list(tags) if isinstance(tags, (list, tuple)) else tags),
+            "sentiment": sentiment,
             "published_at_utc": (None if pd.isna(pub) else pub.isoformat()),
             "published_at_bo": to_lapaz(pub) if pd.notna(pub) else None,
             "fetched_at_utc": (None if pd.isna(fet) else fet.isoformat()),
-            "day": r.get("day"),
+            "day": day,
         }
 
+    cols = ["source", "title", "url", "summary", "tags", "sentiment", "published_at", "fetched_at", "day"]
+    has_summary = df["summary"].map(lambda s: isinstance(s, str) and bool(s.strip())).astype(bool)
     payload = {
         "generated_at_utc": pd.Timestamp.now(tz=timezone.utc).isoformat(),
         "count": int(len(df)),
-        "items": [row_to_obj(r) for _, r in df.iterrows() if isinstance(r.get("summary"), str) and r["summary"].strip()],
+        "items": [row_to_obj(*row) for row in df.loc[has_summary, cols].itertuples(index=False, name=None)],
     }
 
     OUT_JSON.parent.mkdir(parents=True, exist_ok=True)
-    OUT_JSON.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    OUT_JSON.write_bytes(orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
     print(f"[export] wrote {OUT_JSON} items={len(payload['items'])}")
 
 if __name__ == "__main__":
@@ -16,44 +16,58 @@ Usage:
 from __future__ import annotations
 
 import argparse
+import os
 import glob
-import json
 import hashlib
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional, List
 
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from filelock import FileLock
 
 RAW_DIR     = Path("data/raw/news")           
 CURATED_DIR = Path("data/curated/news")   
 LATEST_PATH = Path("data/curated/news/news_latest.parquet")
+READ_WORKERS = os.cpu_count() or 4
 
 BASE_SCHEMA = [
     "source", "section", "url", "url_hash", "title", "text",
-    "published_at", "fetched_at", "day", "ingested_at",
+    "published_at", "fetched_at", "lastmod", "day", "ingested_at",
 ]
 
 
-def _coerce_dt(x) -> Optional[pd.Timestamp]:
+def _coerce_dt(s: pd.Series) -> pd.Series:
     """
-    Parse to timezone-aware Timestamp when possible.
-    - If the string carries an offset (e.g., '-04:00'), it stays tz-aware.
-    - If naive, leave as NaT (we don't guess); fetched_at usually has 'Z'.
+    Parse a column of ISO-8601 strings in one pass.
+    - If the strings carry an offset (e.g., '-04:00'), they stay tz-aware.
+    - Missing or unparseable values become NaT (we don't guess); fetched_at usually has 'Z'.
     """
-    if not x:
-        return None
-    try:
-        ts = pd.to_datetime(x, utc=False)
-        return ts
-    except Exception:
-        return None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        try:
+            out = pd.to_datetime(s, utc=False, format="ISO8601", errors="coerce")
+            if out.dtype != object:
+                # nothing parsed: keep the column tz-aware rather than writing a naive type
+                if out.dt.tz is None and out.isna().all():
+                    out = out.dt.tz_localize("UTC")
+                return out
+        except ValueError:
+            pass
+    # mixed offsets: parse per value so each keeps its own offset
+    return s.map(lambda x: pd.to_datetime(x, utc=False, errors="coerce"), na_action="ignore")
 
 
-def _atomic_write_parquet(df: pd.DataFrame, out_path: Path, lock_path: Optional[Path] = None) -> None:
+def _atomic_write_parquet(df: pd.DataFrame | pa.Table, out_path: Path, lock_path: Optional[Path] = None) -> None:
     """
-    Write df to out_path atomically:
+    Write df (DataFrame or Arrow table) to out_path atomically:
       1) write temp file
       2) replace target
     Guarded by a file lock (cron-safe).
@@ -61,8 +75,9 @@ def _atomic_write_parquet(df: pd.DataFrame, out_path: Path, lock_path: Optional[
     out_path.parent.mkdir(parents=True, exist_ok=True)
     tmp_path = out_path.with_suffix(".tmp.parquet")
     lock = FileLock(str(lock_path or out_path.with_suffix(".lock")), timeout=60)
+    table = pa.Table.from_pandas(df, preserve_index=False) if isinstance(df, pd.DataFrame) else df
     with lock:
-        df.to_parquet(tmp_path, index=False)
+        pq.write_table(table, tmp_path, compression="zstd")
         tmp_path.replace(out_path)
 
 
@@ -105,6 +120,28 @@ def _derive_day(pub: Optional[pd.Timestamp], fet: Optional[pd.Timestamp], fallba
     return fallback_day
 
 
+def _load_row(fp: str, source: str, day: str) -> tuple:
+    """Parse one raw article JSON into a curated row, in BASE_SCHEMA order."""
+    with open(fp, "rb") as fh:
+        obj = orjson.loads(fh.read())
+    url = obj["url"]
+    url_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+
+    return (
+        obj.get("source", source),
+        obj.get("section"),
+        url,
+        url_hash,
+        obj.get("title"),
+        obj.get("text"),
+        obj.get("published_at") or None,
+        obj.get("fetched_at") or None,
+        obj.get("lastmod") or None,
+        day,
+        pd.Timestamp(datetime.now(timezone.utc)),
+    )
+
+
 def _ingest_day_for_source(source: str, day: str) -> Optional[Path]:
     """
     Read raw JSON for one (source, day), write/update curated partition.
@@ -114,34 +151,17 @@ def _ingest_day_for_source(source: str, day: str) -> Optional[Path]:
     if not raw_day_dir.exists():
         return None
 
-    rows = []
-    for fp in glob.glob(str(raw_day_dir / "*.json")):
-        obj = json.loads(Path(fp).read_text(encoding="utf-8"))
-        pub = _coerce_dt(obj.get("published_at"))
-        fet = _coerce_dt(obj.get("fetched_at"))
-
-        url = obj["url"]
-        url_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
-
-        derived_day = _derive_day(pub, fet, day)
-
-        rows.append({
-            "source": obj.get("source", source),
-            "section": obj.get("section"),
-            "url": url,
-            "url_hash": url_hash,
-            "title": obj.get("title"),
-            "text": obj.get("text"),
-            "published_at": pub,
-            "fetched_at": fet,
-            "day": derived_day,
-            "ingested_at": pd.Timestamp(datetime.now(timezone.utc)),
-        })
+    files = glob.glob(str(raw_day_dir / "*.json"))
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as ex:
+        rows = list(ex.map(lambda fp: _load_row(fp, source, day), files))
 
     if not rows:
         return None
 
-    df_new = pd.DataFrame(rows, columns=BASE_SCHEMA)
+    df_new = pd.DataFrame({name: list(col) for name, col in zip(BASE_SCHEMA, zip(*rows))})
+    df_new["published_at"] = _coerce_dt(df_new["published_at"])
+    df_new["fetched_at"] = _coerce_dt(df_new["fetched_at"])
+    df_new["day"] = [_derive_day(pub, fet, day) for pub, fet in zip(df_new["published_at"], df_new["fetched_at"])]
 
     part_dir = CURATED_DIR / f"day={day}"
     out_path = part_dir / "news.parquet"
@@ -152,7 +172,8 @@ def _ingest_day_for_source(source: str, day: str) -> Optional[Path]:
     else:
         df = df_new
 
-    df.sort_values(["url_hash", "fetched_at", "ingested_at"], inplace=True, kind="mergesort")
+    # drop_duplicates hashes url_hash, so only the timestamps need ordering for the latest row to win
+    df = df.sort_values(["fetched_at", "ingested_at"], kind="mergesort")
     df = df.drop_duplicates(subset=["url_hash"], keep="last")
 
     df = df[BASE_SCHEMA]
@@ -161,35 +182,66 @@ def _ingest_day_for_source(source: str, day: str) -> Optional[Path]:
     return out_path
 
 
+def _keep_latest_per_url(table: pa.Table) -> pa.Table:
+    """
+    Arrow equivalent of a stable sort on (url_hash, fetched_at, ingested_at)
+    followed by drop_duplicates("url_hash", keep="last").
+    """
+    table = table.sort_by([("url_hash", "ascending"), ("fetched_at", "ascending"), ("ingested_at", "ascending")])
+    if table.num_rows < 2:
+        return table
+    h = table["url_hash"]
+    is_last = pc.not_equal(h.slice(0, len(h) - 1), h.slice(1)).fill_null(True)
+    return table.filter(pa.concat_arrays(is_last.chunks + [pa.array([True])]))
+
+
+def _scan_schema(files: list[str]) -> pa.Schema:
+    """
+    Schema to scan the day partitions with. Each column takes its type from the
+    newest file that holds a value in it: a column that was all-null on some run
+    is stored with the null type, and letting that file's schema win would make
+    the older partitions fail to cast.
+    """
+    types: dict[str, pa.DataType] = {}
+    fallback: dict[str, pa.DataType] = {}
+    for f in files:
+        md = pq.read_metadata(f)
+        nulls: dict[str, int] = {}
+        for i in range(md.num_row_groups):
+            rg = md.row_group(i)
+            for j in range(rg.num_columns):
+                col = rg.column(j)
+                st = col.statistics
+                n = st.null_count if st is not None and st.has_null_count else 0
+                nulls[col.path_in_schema] = nulls.get(col.path_in_schema, 0) + n
+        for field in md.schema.to_arrow_schema():
+            fallback.setdefault(field.name, field.type)
+            if field.name in types or pa.types.is_null(field.type):
+                continue
+            if nulls.get(field.name, 0) < md.num_rows:
+                types[field.name] = field.type
+    # lastmod is missing from partitions written before it was recorded
+    return pa.schema([(name, types.get(name, fallback.get(name, pa.string()))) for name in BASE_SCHEMA])
+
+
 def build_latest(lookback_days: int = 14) -> Optional[Path]:
     """
     Merge the last N day partitions into a rolling 'latest' parquet, deduped again.
+    The partitions are scanned as one pyarrow dataset and never go through pandas.
     """
     CURATED_DIR.mkdir(parents=True, exist_ok=True)
     parts = sorted(CURATED_DIR.glob("day=*"), reverse=True)[:lookback_days]
 
-    dfs = []
-    for part in parts:
-        f = part / "news.parquet"
-        if f.exists():
-            dfs.append(pd.read_parquet(f))
-
-    if not dfs:
+    files = [str(part / "news.parquet") for part in parts if (part / "news.parquet").exists()]
+    if not files:
         return None
 
-    df = pd.concat(dfs, ignore_index=True)
-
-    df.sort_values(["url_hash", "fetched_at", "ingested_at"], inplace=True, kind="mergesort")
-    df = df.drop_duplicates(subset=["url_hash"], keep="last")
+    table = ds.dataset(files, schema=_scan_schema(files), format="parquet").to_table(columns=BASE_SCHEMA)
+    table = _keep_latest_per_url(table)
 
-    df.sort_values(
-        ["published_at", "fetched_at", "ingested_at"],
-        ascending=[False, False, False],
-        inplace=True,
-        kind="mergesort",
-    )
+    table = table.sort_by([("published_at", "descending"), ("fetched_at", "descending"), ("ingested_at", "descending")])
 
-    _atomic_write_parquet(df, LATEST_PATH)
+    _atomic_write_parquet(table, LATEST_PATH)
     return LATEST_PATH
 
 
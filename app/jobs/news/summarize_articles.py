@@ -1,74 +1,214 @@
+import re
+from functools import lru_cache
 from pathlib import Path
 import pandas as pd
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import torch
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 
 LATEST = Path("data/curated/news/news_latest.parquet")
 OUT    = Path("data/curated/news/news_summaries.parquet")
+SUMMARY_SCHEMA = pa.schema([("url_hash", pa.string()), ("summary", pa.string())])
 
 MODEL_ID = "csebuetnlp/mT5_multilingual_XLSum"
+BATCH_SIZE = 16
+MAX_INPUT_TOKENS = 512
+MAX_NEW_TOKENS = 100
+MIN_NEW_TOKENS = 20
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# compile only on GPU: on the CPU runner compile time outweighs an hourly batch
+COMPILE = DEVICE == "cuda"
+PAD_MULTIPLE = 64
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, use_fast=False, legacy=False)
-model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_ID)
 
-summ = pipeline(
-    "summarization",
-    model=model,
-    tokenizer=tokenizer,
-    device_map="auto",
-)
+def _model_dtype() -> torch.dtype:
+    """
+    bfloat16 on GPUs that support it. mT5 overflows in float16, and CPUs
+    without native bf16 matmuls run slower in bfloat16, so both stay float32.
+    """
+    if torch.cuda.is_available() and torch.cuda.is_bf16_supported():
+        return torch.bfloat16
+    return torch.float32
 
-COUNTRIES = [
+
+def _load_model():
+    """
+    mT5 with torch's fused scaled_dot_product_attention where the installed
+    transformers release implements it for this architecture, eager otherwise.
+    """
+    try:
+        return AutoModelForSeq2SeqLM.from_pretrained(MODEL_ID, torch_dtype=_model_dtype(), attn_implementation="sdpa")
+    except ValueError:
+        return AutoModelForSeq2SeqLM.from_pretrained(MODEL_ID, torch_dtype=_model_dtype())
+
+
+@lru_cache(maxsize=1)
+def get_model():
+    """
+    Tokenizer and model, loaded on first use so importing this module or a
+    run with nothing new to summarize never loads mT5.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, use_fast=True, legacy=False)
+    model = _load_model().to(DEVICE).eval()
+    if DEVICE == "cpu":
+        # int8 weights for the Linear layers, activations quantized on the fly
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    if COMPILE:
+        model.forward = torch.compile(model.forward, mode="reduce-overhead")
+    return tokenizer, model
+
+COUNTRIES = frozenset({
     "bolivia", "perú", "peru", "argentina", "chile", "brasil", "brasilia",
     "colombia", "paraguay", "uruguay", "ecuador", "méxico", "mexico",
-    "estados unidos", "ee.uu.", "eeuu", "españa", "brasil", "brasilia",
-]
+    "estados unidos", "ee.uu.", "eeuu", "españa",
+})
+
+
+# longest first, so "brasilia" is matched whole rather than as "brasil"
+_COUNTRY_RE = re.compile("|".join(re.escape(c) for c in sorted(COUNTRIES, key=len, reverse=True)))
 
 
 def has_hallucinated_country(article: str, summary: str) -> bool:
     """Return True if summary mentions a country that never appears in article."""
+    mentioned = set(_COUNTRY_RE.findall(summary.lower()))
+    if not mentioned:
+        return False
     art = article.lower()
-    summ = summary.lower()
-    for c in COUNTRIES:
-        if c in summ and c not in art:
-            return True
-    return False
+    return any(c not in art for c in mentioned)
 
 
-def summarize_text(txt: str, source: str | None = None) -> str | None:
-    if not isinstance(txt, str):
-        return None
-    txt = txt.strip()
-    if len(txt) < 200:
-        return None
-
-    body = txt[:2000]
-
+def _prefix(source: str | None = None) -> str:
     src_label = f" del medio {source}" if source else ""
-    prefix = (
+    return (
         "Resuma en 1–2 oraciones en español la siguiente noticia económica de Bolivia"
         f"{src_label}. Enfóquese en lo que ocurre en Bolivia y evite mencionar "
         "otros países a menos que aparezcan explícitamente en el texto:\n\n"
     )
 
-    input_text = prefix + body
 
-    try:
-        out = summ(
-            input_text,
-            max_length=140,
-            min_length=40,
-            do_sample=False,
-            truncation=True,
-        )[0]["summary_text"].strip()
-    except Exception as e:
-        print(f"[summaries] error summarizing article: {e}")
-        return None
+@lru_cache(maxsize=None)
+def _prefix_ids(source: str | None = None) -> list[int]:
+    """Token ids of the instruction prefix, encoded once per source label."""
+    tokenizer, _ = get_model()
+    return tokenizer(_prefix(source), add_special_tokens=False)["input_ids"]
+
 
-    if has_hallucinated_country(body, out):
-        print("[summaries] dropped summary due to hallucinated country")
+def _body(txt) -> str | None:
+    """Article text to summarize, or None if it is too short to bother."""
+    if not isinstance(txt, str) or len(txt) < 200:
+        return None
+    txt = txt.strip()
+    if len(txt) < 200:
         return None
+    # the real cut is by tokens in summarize_texts; this only bounds what the tokenizer sees
+    return txt[:MAX_INPUT_TOKENS * 8]
+
+
+def _generate(input_ids: list[list[int]]) -> list[str]:
+    """Decoded summaries for one batch of token id lists."""
+    tokenizer, model = get_model()
+    batch = tokenizer.pad(
+        {"input_ids": input_ids},
+        pad_to_multiple_of=PAD_MULTIPLE if COMPILE else None,
+        return_tensors="pt",
+    ).to(model.device)
+    with torch.inference_mode():
+        out = model.generate(
+            **batch,
+            max_new_tokens=MAX_NEW_TOKENS,
+            min_new_tokens=MIN_NEW_TOKENS,
+            num_beams=1,
+            do_sample=False,
+            use_cache=True,
+        )
+    return tokenizer.batch_decode(out, skip_special_tokens=True, clean_up_tokenization_spaces=False)
+
+
+def summarize_texts(texts: list, source: str | None = None) -> tuple[list[str | None], list[int]]:
+    """
+    One summary per text (None where the article is too short or the summary
+    is rejected), plus the positions whose generation failed. Eligible bodies
+    are tokenized together behind the shared prefix ids, cut to
+    MAX_INPUT_TOKENS, and generated in batches, longest first so each batch
+    pads to a similar length. A batch that raises is retried one article at a
+    time, so one bad input does not cost the rest of its batch.
+    """
+    bodies = [_body(t) for t in texts]
+    idx = [i for i, b in enumerate(bodies) if b is not None]
+    out: list[str | None] = [None] * len(texts)
+    failed: list[int] = []
+    if not idx:
+        return out, failed
+
+    tokenizer, _ = get_model()
+    prefix_ids = _prefix_ids(source)
+    body_ids = tokenizer(
+        [bodies[i] for i in idx],
+        add_special_tokens=False,
+        truncation=True,
+        max_length=MAX_INPUT_TOKENS - len(prefix_ids) - 1,
+    )["input_ids"]
+
+    # the country check has to see what the model saw, not the untruncated body
+    for i, seen in zip(idx, tokenizer.batch_decode(body_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False)):
+        bodies[i] = seen
+
+    order = sorted(range(len(idx)), key=lambda k: len(body_ids[k]), reverse=True)
+    idx = [idx[k] for k in order]
+    ids = [prefix_ids + body_ids[k] + [tokenizer.eos_token_id] for k in order]
 
-    return out or None
+    for start in range(0, len(idx), BATCH_SIZE):
+        rows = idx[start:start + BATCH_SIZE]
+        batch = ids[start:start + BATCH_SIZE]
+        try:
+            results = _generate(batch)
+        except Exception as e:
+            print(f"[summaries] error summarizing batch, retrying one by one: {e}")
+            results = []
+            for i, one in zip(rows, batch):
+                try:
+                    results.extend(_generate([one]))
+                except Exception as e:
+                    print(f"[summaries] error summarizing article: {e}")
+                    results.append(None)
+                    failed.append(i)
+
+        for i, text in zip(rows, results):
+            if text is None:
+                continue
+            text = text.strip()
+            if has_hallucinated_country(bodies[i], text):
+                print("[summaries] dropped summary due to hallucinated country")
+                continue
+            out[i] = text or None
+    return out, failed
+
+
+def _append_parquet(prev: pq.ParquetFile, path: Path, new: pa.Table) -> int:
+    """
+    Append new to prev (already open on path) as one more row group. The
+    existing row groups are streamed through a ParquetWriter into a temp file
+    that replaces path, so nothing is concatenated or deduped in pandas; new
+    only holds url_hashes that are not in the file yet. prev is closed before
+    the replace. Returns the row count.
+    """
+    schema = prev.schema_arrow
+    new = pa.table(
+        [new[f.name] if f.name in new.column_names else pa.nulls(len(new), f.type) for f in schema],
+        schema=schema.remove_metadata(),
+    ).cast(schema)
+
+    tmp = path.with_suffix(".tmp.parquet")
+    with pq.ParquetWriter(tmp, schema, compression="zstd", compression_level=3) as writer:
+        for i in range(prev.num_row_groups):
+            writer.write_table(prev.read_row_group(i))
+        writer.write_table(new)
+    rows = prev.metadata.num_rows + len(new)
+    prev.close()
+    tmp.replace(path)
+    return rows
 
 
 def main():
@@ -76,37 +216,42 @@ def main():
         print("[summaries] latest parquet not found")
         return
 
-    df = pd.read_parquet(LATEST).drop_duplicates("url_hash", keep="last")
-
-    done = set()
-    if OUT.exists():
-        prev = pd.read_parquet(OUT)
-        done = set(prev["url_hash"])
+    df = pd.read_parquet(LATEST, columns=["url_hash", "text"], engine="pyarrow").drop_duplicates("url_hash", keep="last")
 
-    todo = df[~df["url_hash"].isin(done)].copy()
-    if todo.empty and OUT.exists():
-        print("[summaries] nothing new")
-        return
+    prev = pq.ParquetFile(OUT) if OUT.exists() else None
+    try:
+        todo = df.copy()
+        if prev is not None:
+            done = pc.unique(prev.read(columns=["url_hash"])["url_hash"])
+            seen = pc.is_in(pa.array(df["url_hash"]), value_set=done)
+            todo = df[~seen.to_numpy(zero_copy_only=False)].copy()
+        if todo.empty and prev is not None:
+            print("[summaries] nothing new")
+            return
 
-    if todo.empty:
-        df.assign(summary=None).to_parquet(OUT, index=False)
-        print("[summaries] wrote empty baseline file")
-        return
+        if todo.empty:
+            pq.write_table(SUMMARY_SCHEMA.empty_table(), OUT, compression="zstd", compression_level=3)
+            print("[summaries] wrote empty baseline file")
+            return
 
-    todo["summary"] = todo["text"].map(summarize_text)
+        summaries, failed = summarize_texts(todo["text"].tolist())
+        todo["summary"] = summaries
+        if failed:
+            # not written, so the anti-join picks them up again next run
+            print(f"[summaries] {len(failed)} articles failed; leaving them for the next run")
+            todo = todo.drop(todo.index[failed])
 
-    if OUT.exists():
-        prev = pd.read_parquet(OUT)
-        out = pd.concat(
-            [prev, todo[["url_hash", "summary"]]],
-            ignore_index=True,
-        )
-        out = out.drop_duplicates("url_hash", keep="last")
-    else:
-        out = todo[["url_hash", "summary"]]
+        new = pa.Table.from_pandas(todo[["url_hash", "summary"]], schema=SUMMARY_SCHEMA, preserve_index=False)
+        if prev is not None:
+            rows = _append_parquet(prev, OUT, new)
+        else:
+            pq.write_table(new, OUT, compression="zstd", compression_level=3)
+            rows = new.num_rows
 
-    out.to_parquet(OUT, index=False)
-    print(f"[summaries] wrote {OUT}, rows={len(out)}")
+        print(f"[summaries] wrote {OUT}, rows={rows}")
+    finally:
+        if prev is not None:
+            prev.close()
 
 
 if __name__ == "__main__":
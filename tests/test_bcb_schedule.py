@@ -0,0 +1,40 @@
+import sys
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app/jobs/macro/bcb"))
+
+from _parse_utils import build_schedule  # noqa: E402
+
+MONTHS = ["ENE", "FEB", "MAR", "ABR", "MAY", "JUN", "JUL", "AGO", "SEP", "OCT", "NOV", "DIC"]
+
+
+def sheet(rows):
+    """Sheet whose body (row 13 on) is rows of (year cell, month cell)."""
+    return pd.DataFrame([[None, None]] * 12 + [list(r) for r in rows], dtype=object)
+
+
+def labels(df):
+    out = build_schedule(df, start_row_1idx=13, year_col_idx=0, month_col_idx=1)
+    return list(zip(out["year"].astype(int), out["month"].astype(int)))
+
+
+class BuildScheduleTest(unittest.TestCase):
+    def test_year_without_months_keeps_the_following_block(self):
+        df = sheet([(2003, None), (2004, None)] + [(None, m) for m in MONTHS])
+        self.assertEqual(labels(df), [(2003, m) for m in range(1, 13)])
+
+    def test_consecutive_blocks(self):
+        df = sheet([(2003, None)] + [(None, m) for m in MONTHS]
+                   + [("2004", None), (None, "ENE"), (None, "FEB")])
+        self.assertEqual(labels(df), [(2003, m) for m in range(1, 13)] + [(2004, 1), (2004, 2)])
+
+    def test_out_of_range_number_is_not_a_year(self):
+        df = sheet([(2003, None), (None, "ENE"), (12019, "FEB")])
+        self.assertEqual(labels(df), [(2003, 1), (2003, 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()